@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+問題データ（Excel）の検証ツール
+app.py が読み込むシート・列をどう判定したか、読み込み時に捨てられる行、
+同じ／ほとんど同じ例文の重複を一覧表示します。
+Excel は1行ずつ読み、重複は総当たりで比べずに MinHash/LSH で探すので、10万行規模のファイルでも短時間で確認できます。
+
+使い方:
+    python validate_excel.py                       # 同梱の problem_answers_added.xlsx を検証
+    python validate_excel.py 問題と苦しみ.xlsx
+    python validate_excel.py 問題と苦しみ.xlsx --threshold 0.7
+終了コード: 0=問題なし, 1=捨てられる行・重複・列の問題あり, 2=ファイルを開けない
+"""
+import argparse
+import os
+import re
+import sys
+import unicodedata
+
+import numpy as np
+from openpyxl import load_workbook
+
+# app.py と同じ既定値（列名で見つからないときの列位置。0始まり）
+EXCEL_DEFAULT_FILENAME = "problem_answers_added.xlsx"
+COL_DEKIGOTO = 1
+COL_MONDAI = 2
+COL_KURUSHIMI = 3
+COL_KAITO = 4
+# app.py の _df_to_rows が探す列名（この順に探す）
+COLUMN_NAMES = [
+    ("出来事", ["出来事", "イベント"], COL_DEKIGOTO),
+    ("問題", ["問題"], COL_MONDAI),
+    ("苦しみ", ["苦しみ"], COL_KURUSHIMI),
+    ("回答", ["回答", "解説"], COL_KAITO),
+]
+# pandas.read_excel が既定で空欄（NaN）として扱う文字列。これだけのセルは空として捨てられる
+PANDAS_NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+# 類似判定（MinHash/LSH）の設定
+DEFAULT_THRESHOLD = 0.8  # 推定類似度（Jaccard）がこれ以上なら「ほぼ重複」
+MIN_THRESHOLD = 0.1  # これより低いと LSH の取りこぼしが LSH_MAX_MISS を超える
+DEFAULT_NGRAM = 3  # 文字 n-gram の n
+NUM_PERM = 64  # MinHash の署名の長さ
+BUCKET_CAP = 64  # LSH の1バケットに入れる行数の上限（コピペで似た行が大量にあっても比較回数が増え続けないように）
+LSH_MAX_MISS = 0.01  # 類似度がちょうど閾値の組を LSH が候補にしない確率の上限（バンドの行数はこれで決める）
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_WORD = re.compile(r"[\W_]+")
+_NAN = float("nan")
+BATCH_SIZE = 4096  # MinHash 署名をまとめて計算する行数
+# まとめて計算する文字数の上限。作業用の配列は NUM_PERM × 文字数 × 8 バイトなので、約 100MB に収まるようにする
+BATCH_CHARS = 200_000
+
+
+def _header_names(values):
+    """見出し行を pandas と同じ列名にする（空欄は「Unnamed: n」、重複は「名前.1」）。"""
+    names = []
+    seen = {}
+    for i, v in enumerate(values):
+        name = v if v is not None else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _resolve_col(columns, names):
+    """app.py の _find_col と同じ規則で列を探し、(列インデックス, 判定方法, 列名) を返す。"""
+    for name in names:
+        if name in columns:
+            return columns.index(name), "完全一致", name
+        for i, col in enumerate(columns):
+            c = str(col).strip()
+            if c.startswith(name):
+                return i, "前方一致", col
+            if name in c:
+                return i, "部分一致", col
+    return None, None, None
+
+
+def _level_of_sheet(sheet_name):
+    """app.py の _sheet_for_level と同じ規則で、シート名がレベル1・2のどちらに当たるかを返す。"""
+    nfkc = unicodedata.normalize("NFKC", str(sheet_name).strip())
+    n = "".join(nfkc.split())
+    n_asc = "".join(c for c in nfkc.upper() if c not in " .・")
+    for level_num in (1, 2):
+        if n == f"レベル{level_num}" or n_asc == f"NO{level_num}":
+            return level_num
+    return None
+
+
+def _row_values(cells):
+    """行のセルの値をタプルにする。数式のエラー値（#DIV/0!・#REF! など）は pandas と同じく NaN にする。"""
+    return tuple(_NAN if c.data_type == "e" else c.value for c in cells)
+
+
+def _cell_text(value):
+    """pandas で読んだときと同じように、セルを前後の空白を除いた文字列にする（空欄は ""）。"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value != value:
+        return ""
+    if isinstance(value, str) and value in PANDAS_NA_VALUES:
+        return ""
+    return str(value).strip()
+
+
+def _band_rows_for(threshold, num_perm=NUM_PERM, max_miss=LSH_MAX_MISS):
+    """取りこぼし率が max_miss 以下になる範囲で、LSH の1バンドあたりの行数をできるだけ大きく選ぶ。"""
+    for rows in range(num_perm, 0, -1):
+        if (1 - threshold ** rows) ** (num_perm // rows) <= max_miss:
+            return rows
+    return 1
+
+
+def _normalize(text):
+    """重複判定用に NFKC 正規化し、小文字化して空白・句読点・記号を取り除く。"""
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+class DuplicateIndex:
+    """完全一致（正規化後）と MinHash/LSH による近似重複を、行を追加しながら検出する。"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, ngram=DEFAULT_NGRAM, num_perm=NUM_PERM, band_rows=None, seed=1):
+        self.threshold = threshold
+        self.ngram = ngram
+        self.num_perm = num_perm
+        # 閾値が低いほどバンドを細かくして、閾値付近の組を取りこぼさないようにする
+        self.band_rows = band_rows if band_rows is not None else _band_rows_for(threshold, num_perm)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)
+        # バンド内の band_rows 個の値を1つの整数キーにまとめるための係数
+        self._band_mult = rng.randint(1, int(_MAX_HASH), size=self.band_rows, dtype=np.uint64)
+        self._exact = {}
+        self._keys = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(num_perm // self.band_rows)]
+
+    def _signatures_for(self, texts):
+        """正規化済みの文ごとに、文字 n-gram の MinHash 署名（num_perm 個の最小ハッシュ値）をまとめて計算する。"""
+        n = self.ngram
+        # 各文の後ろに n-1 文字の区切り（\0）を付けて連結し、全位置の n-gram を一度にハッシュする。
+        # n 文字未満の文は区切りを含めた1つの n-gram になる。同じ n-gram が何度出ても最小値は変わらない
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        pad = "\0" * (n - 1)
+        codes = np.frombuffer("".join(t + pad for t in texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        row_starts = np.concatenate(([0], np.cumsum(lengths + n - 1)[:-1]))
+        windows = np.maximum(lengths - n, 0) + 1
+        win_offsets = np.concatenate(([0], np.cumsum(windows)[:-1]))
+        starts = np.repeat(row_starts - win_offsets, windows) + np.arange(int(windows.sum()))
+        h = np.zeros(len(starts), dtype=np.uint64)
+        for k in range(n):
+            h = h * np.uint64(0x100000001B3) + codes[starts + k]
+        h = (h ^ (h >> np.uint64(32))) & _MAX_HASH
+        # (a*h + b) mod 2^64 の上位 32 ビットをハッシュ族として使う（multiply-shift 法。桁あふれは意図どおり）
+        phv = np.outer(self._a, h)
+        phv += self._b[:, None]
+        phv >>= np.uint64(32)
+        return np.minimum.reduceat(phv, win_offsets, axis=1).T.astype(np.uint32)
+
+    def add_many(self, items):
+        """(key, 列の値のタプル) を順に登録し、先に登録した行と重複していれば (key, (相手の key, 類似度, 完全一致か)) を返す。"""
+        matches = []
+        new_items = []
+        for pos, (key, fields) in enumerate(items):
+            # 列ごとに正規化し、列の区切りが消えないようタプルのまま完全一致を判定する
+            norm_fields = tuple(_normalize(f) for f in fields)
+            if norm_fields in self._exact:
+                # 完全一致は LSH に入れない（同じ文が大量にあってもバケットが膨らまないように）
+                matches.append((pos, key, (self._exact[norm_fields], 1.0, True)))
+                continue
+            self._exact[norm_fields] = key
+            new_items.append((pos, key, "\0".join(norm_fields)))
+        if not new_items:
+            return [m[1:] for m in matches]
+        sigs = self._signatures_for([norm for _, _, norm in new_items])
+        n_bands = len(self._buckets)
+        band_keys = (sigs[:, :n_bands * self.band_rows].reshape(len(sigs), n_bands, self.band_rows) * self._band_mult).sum(axis=2)
+        for (pos, key, _), sig, keys in zip(new_items, sigs, band_keys.tolist()):
+            candidates = []
+            for buckets, band_key in zip(self._buckets, keys):
+                hit = buckets.get(band_key)
+                if hit:
+                    candidates.extend(hit)
+            if candidates:
+                # 候補の署名をまとめて比べる（np.unique で昇順になるので、同点なら先に登録した行を選ぶ）
+                candidates = np.unique(np.array(candidates))
+                agree = (self._signatures[candidates] == sig).sum(axis=1)
+                best = int(agree.argmax())
+                best_sim = int(agree[best]) / self.num_perm
+                if best_sim >= self.threshold:
+                    matches.append((pos, key, (self._keys[candidates[best]], best_sim, False)))
+            idx_new = len(self._keys)
+            if idx_new == len(self._signatures):
+                self._signatures = np.concatenate((self._signatures, np.empty_like(self._signatures)))
+            self._keys.append(key)
+            self._signatures[idx_new] = sig
+            for buckets, band_key in zip(self._buckets, keys):
+                # 満杯のバケットには足さない（先に登録した行とは引き続き比べられる）
+                bucket = buckets.setdefault(band_key, [])
+                if len(bucket) < BUCKET_CAP:
+                    bucket.append(idx_new)
+        matches.sort(key=lambda m: m[0])
+        return [m[1:] for m in matches]
+
+
+def _row_width(values):
+    """pandas で読んだときの行の長さ（末尾の空欄を除いた列数）を返す。"""
+    for i in range(len(values) - 1, -1, -1):
+        if values[i] is not None and values[i] != "":
+            return i + 1
+    return 0
+
+
+def _validate_sheet(ws, sheet_name, index):
+    """1シートを1行ずつ読み、列の判定・捨てられる行・重複をまとめた dict を返す。"""
+    sheet_report = {
+        "name": sheet_name, "columns": [], "warnings": [], "fails": None,
+        "rows": 0, "kept": 0, "blank": 0, "dropped": [], "duplicates": [],
+    }
+    # 保存されている <dimension> が実際の範囲より狭いと行・列が切り捨てられるので、pandas と同じく読み直させる
+    ws.reset_dimensions()
+    # values_only ではエラー値が普通の文字列になってしまうので、セルの型を見て値にする
+    rows = map(_row_values, ws.iter_rows())
+    # pandas と同じく、空行であっても1行目を見出しとして扱う
+    header = next(rows, None)
+    if header is None:
+        sheet_report["warnings"].append("データがありません")
+        return sheet_report
+    columns = _header_names(header)
+    # pandas の列数は見出し行とデータ行のうち一番長い行で決まるので、読み終えてから既定の列位置を確かめる
+    width = _row_width(header)
+    found = {label: _resolve_col(columns, names) for label, names, _ in COLUMN_NAMES}
+    read_idx = {label: found[label][0] if found[label][0] is not None else default for label, _, default in COLUMN_NAMES}
+
+    def get(values, label):
+        idx = read_idx[label]
+        if idx >= len(values):
+            return ""
+        return _cell_text(values[idx])
+
+    def flush(pending):
+        for key, match in index.add_many(pending):
+            sheet_report["duplicates"].append((key,) + match)
+        pending.clear()
+
+    pending = []
+    pending_chars = 0
+    pending_blank = 0
+    for row_num, values in enumerate(rows, 2):
+        row_width = _row_width(values)
+        width = max(width, row_width)
+        if not row_width:
+            # 本当に空のセルだけの行。「NA」などの文字列だけの行は空行ではなく、捨てられる行として数える
+            # 末尾の空行は pandas でも読み込まれないので、後ろにデータ行が続いたときだけ数える
+            pending_blank += 1
+            continue
+        sheet_report["blank"] += pending_blank
+        pending_blank = 0
+        sheet_report["rows"] += 1
+        dekigoto = get(values, "出来事")
+        mondai = get(values, "問題")
+        kurushimi = get(values, "苦しみ")
+        if not dekigoto:
+            sheet_report["dropped"].append((sheet_name, row_num, "「出来事」が空欄です"))
+            continue
+        if not (mondai or kurushimi):
+            sheet_report["dropped"].append((sheet_name, row_num, "「問題」「苦しみ」がどちらも空欄です"))
+            continue
+        sheet_report["kept"] += 1
+        pending.append(((sheet_name, row_num), (dekigoto, mondai, kurushimi)))
+        pending_chars += len(dekigoto) + len(mondai) + len(kurushimi)
+        if len(pending) >= BATCH_SIZE or pending_chars >= BATCH_CHARS:
+            flush(pending)
+            pending_chars = 0
+    flush(pending)
+
+    used = {}
+    for label, _, default in COLUMN_NAMES:
+        idx, how, col = found[label]
+        if idx is not None:
+            how = f"「{col}」に{how}"
+        elif label == "回答" and width <= default:
+            sheet_report["columns"].append((label, None, "見つからないため解説なしで読み込みます"))
+            continue
+        else:
+            idx = default
+            how = f"列名が見つからないため既定の {default + 1} 列目を使用"
+            if idx >= width and sheet_report["rows"]:
+                # app.py の _df_to_rows は IndexError になり、load_data_level1_level2 が全シート分を捨てる
+                sheet_report["fails"] = f"「{label}」列がなく、既定の {default + 1} 列目もありません"
+        sheet_report["columns"].append((label, idx, how))
+        used.setdefault(idx, []).append(label)
+    for idx, labels in used.items():
+        if len(labels) > 1:
+            sheet_report["warnings"].append(f"{idx + 1} 列目が「{'」「'.join(labels)}」に重複して使われています")
+    if sheet_report["fails"]:
+        # 読み込めないシートの行は出題されないので、捨てられる行・重複としては数えない
+        sheet_report["kept"] = 0
+        sheet_report["dropped"] = []
+        sheet_report["duplicates"] = []
+    return sheet_report
+
+
+def open_workbook(excel_path):
+    """app.py（pandas）と同じく、数式は保存済みの値で読む読み取り専用モードで Excel を開く。"""
+    return load_workbook(excel_path, read_only=True, data_only=True)
+
+
+def validate_workbook(wb, threshold=DEFAULT_THRESHOLD, ngram=DEFAULT_NGRAM):
+    """open_workbook で開いた Excel を検証し、シートの判定・列の判定・捨てられる行・重複をまとめた dict を返す。"""
+    report = {
+        "levels": {}, "shadowed": [], "unused": [], "fallback": None, "errors": [],
+        "sheets": [], "dropped": [], "duplicates": [],
+    }
+    for s in wb.sheetnames:
+        level_num = _level_of_sheet(s)
+        if level_num is None:
+            report["unused"].append(s)
+        elif level_num in report["levels"]:
+            # app.py は最初に一致したシートだけを読む
+            report["shadowed"].append((s, level_num, report["levels"][level_num]))
+        else:
+            report["levels"][level_num] = s
+    index = DuplicateIndex(threshold=threshold, ngram=ngram)
+    checked = {}
+
+    def check(s):
+        if s not in checked:
+            checked[s] = _validate_sheet(wb[s], s, index)
+            report["sheets"].append(checked[s])
+            if checked[s]["fails"]:
+                report["errors"].append(f"シート「{s}」: {checked[s]['fails']}。ワークブック全体が読み込めません")
+        return checked[s]
+
+    level_sheets = [check(report["levels"][n]) for n in sorted(report["levels"])]
+    # app.py は1シートでも読み込みに失敗すると、レベル1・2の両方を空にする
+    if any(sheet["fails"] for sheet in level_sheets):
+        level_kept = 0
+    else:
+        level_kept = sum(sheet["kept"] for sheet in level_sheets)
+    if level_kept == 0 and wb.sheetnames:
+        # レベル1・2とも0件なら、app.py は先頭シートをレベル1・2の両方に使う
+        first = wb.sheetnames[0]
+        sheet = check(first)
+        if first in report["unused"]:
+            report["unused"].remove(first)
+        if sheet["fails"]:
+            report["errors"].append(f"先頭シート「{first}」も読み込めないため、出題できる問題がありません")
+        elif sheet["kept"] == 0:
+            report["errors"].append(f"先頭シート「{first}」にも出題に使える行がないため、出題できる問題がありません")
+        else:
+            report["fallback"] = first
+    for sheet in report["sheets"]:
+        report["dropped"].extend(sheet["dropped"])
+        report["duplicates"].extend(sheet["duplicates"])
+    return report
+
+
+def _format_report(report):
+    """検証結果を表示用の行リストにする。"""
+    lines = ["■ シートの判定"]
+    for level_num in (1, 2):
+        s = report["levels"].get(level_num)
+        lines.append(f"  レベル{level_num}: {s}" if s else f"  レベル{level_num}: 該当シートなし")
+    if report["fallback"]:
+        lines.append(f"  レベル用のシートから出題できる行がないため、先頭シート「{report['fallback']}」をレベル1・2の両方に使用")
+    for s, level_num, first in report["shadowed"]:
+        lines.append(f"  ※「{s}」もレベル{level_num}に一致しますが、先にある「{first}」だけが使われます")
+    for s in report["unused"]:
+        lines.append(f"  未使用: {s}")
+    for e in report["errors"]:
+        lines.append(f"  エラー: {e}")
+    for sheet in report["sheets"]:
+        lines.append(f"■ シート「{sheet['name']}」")
+        for label, idx, how in sheet["columns"]:
+            lines.append(f"  {label}: {how}" if idx is None else f"  {label}: {idx + 1} 列目（{how}）")
+        for w in sheet["warnings"]:
+            lines.append(f"  注意: {w}")
+        if sheet["fails"]:
+            lines.append(f"  エラー: {sheet['fails']}（app.py では IndexError になります）")
+        else:
+            blank = f"、空行 {sheet['blank']} 行は無視" if sheet["blank"] else ""
+            lines.append(f"  データ行 {sheet['rows']} 行 → 出題に使える行 {sheet['kept']} 行{blank}")
+    lines.append(f"■ 読み込み時に捨てられる行（{len(report['dropped'])} 行）")
+    for s, row_num, reason in report["dropped"]:
+        lines.append(f"  {s} {row_num}行目: {reason}")
+    lines.append(f"■ 重複・ほぼ重複（{len(report['duplicates'])} 行）")
+    for (s, row_num), (s2, row_num2), sim, exact in report["duplicates"]:
+        kind = "完全一致" if exact else f"類似度 {sim:.2f}"
+        lines.append(f"  {s} {row_num}行目 ≒ {s2} {row_num2}行目（{kind}）")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="問題データ（Excel）の読み込み結果と重複を確認します。")
+    parser.add_argument(
+        "excel_path", nargs="?",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), EXCEL_DEFAULT_FILENAME),
+        help=f"検証する Excel ファイル（省略時は {EXCEL_DEFAULT_FILENAME}）",
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"ほぼ重複とみなす類似度（{MIN_THRESHOLD}〜1）")
+    parser.add_argument("--ngram", type=int, default=DEFAULT_NGRAM, help="類似判定に使う文字 n-gram の n")
+    args = parser.parse_args(argv)
+    if not MIN_THRESHOLD <= args.threshold <= 1:
+        parser.error(f"--threshold は {MIN_THRESHOLD} 以上 1 以下で指定してください")
+    if args.ngram < 1:
+        parser.error("--ngram は 1 以上で指定してください")
+    try:
+        wb = open_workbook(args.excel_path)
+    except Exception as e:
+        # 開けないときだけここで止める（検証中の例外はトレースバックを出す）
+        print(f"Excel を開けませんでした: {args.excel_path}（{e}）", file=sys.stderr)
+        return 2
+    try:
+        report = validate_workbook(wb, threshold=args.threshold, ngram=args.ngram)
+    finally:
+        wb.close()
+    print("\n".join(_format_report(report)))
+    has_warnings = any(sheet["warnings"] for sheet in report["sheets"])
+    return 1 if report["errors"] or has_warnings or report["dropped"] or report["duplicates"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())